@@ -39,7 +39,7 @@ class EdfReader(CyEdfReader):
 
     def getNSamples(self):
         return np.array([self.samples_in_file(chn)
-                         for chn in np.arange(self.signals_in_file)])
+                         for chn in range(self.signals_in_file)])
 
     def readAnnotations(self):
         """
@@ -49,7 +49,7 @@ class EdfReader(CyEdfReader):
         annot = np.array(annot)
         ann_time = self._get_float(annot[:, 0])
         ann_text = annot[:, 2]
-        for i in np.arange(len(annot[:, 1])):
+        for i in range(len(annot[:, 1])):
             if annot[i, 1] == '':
                 annot[i, 1] = '-1'
         ann_duration = self._get_float(annot[:, 1])
@@ -57,7 +57,7 @@ class EdfReader(CyEdfReader):
 
     def _get_float(self, v):
         result = np.zeros(np.size(v))
-        for i in np.arange(np.size(v)):
+        for i in range(np.size(v)):
             try:
                 if not v[i]:
                     result[i] = -1
@@ -96,7 +96,7 @@ class EdfReader(CyEdfReader):
         Returns the  header of all signals as array of dicts
         """
         signalHeader = []
-        for chn in np.arange(self.n_channels):
+        for chn in range(self.n_channels):
             signalHeader.append(self.getSignalHeader(chn))
         return signalHeader
 
@@ -172,7 +172,7 @@ class EdfReader(CyEdfReader):
         Returns  samplefrequencies of all signals.
         """
         return np.array([round(self.samplefrequency(chn))
-                         for chn in np.arange(self.signals_in_file)])
+                         for chn in range(self.signals_in_file)])
 
     def getSampleFrequency(self,chn):
         """
@@ -188,7 +188,7 @@ class EdfReader(CyEdfReader):
         Returns all labels (name) ("FP1", "SaO2", etc.).
         """
         return [self.signal_label(chn).strip()
-                for chn in np.arange(self.signals_in_file)]
+                for chn in range(self.signals_in_file)]
 
     def getLabel(self,chn):
         """
@@ -280,7 +280,7 @@ class EdfReader(CyEdfReader):
 
     def file_info_long(self):
         self.file_info()
-        for ii in np.arange(self.signals_in_file):
+        for ii in range(self.signals_in_file):
             print("label:", self.getSignalLabel(ii), "fs:",
                   self.getSignalFreqs()[ii], "nsamples",
                   self.getNSamples()[ii])
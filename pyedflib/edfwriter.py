@@ -27,39 +27,86 @@
 from __future__ import division, print_function, absolute_import
 
 import numpy as np
-import sys
+import threading
 from datetime import datetime, date
-from ._pyedflib import FILETYPE_EDFPLUS, FILETYPE_BDFPLUS
-from ._pyedflib import open_file_writeonly, set_physical_maximum, set_patient_additional, set_digital_maximum
-from ._pyedflib import set_birthdate, set_digital_minimum, set_technician, set_recording_additional, set_patientname
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+from ._pyedflib import FILETYPE_EDFPLUS, FILETYPE_BDF, FILETYPE_BDFPLUS
+from ._pyedflib import open_file_writeonly, set_patient_additional, set_signal_header
+from ._pyedflib import set_birthdate, set_technician, set_recording_additional, set_patientname
 from ._pyedflib import set_patientcode, set_equipment, set_admincode, set_gender, set_datarecord_duration
-from ._pyedflib import set_startdatetime, set_samplefrequency, set_physical_minimum, set_label, set_physical_dimension
-from ._pyedflib import set_transducer, set_prefilter, write_physical_samples, close_file, write_annotation_latin1, write_annotation_utf8
+from ._pyedflib import set_startdatetime, set_write_buffer_size, write_physical_samples, blockwrite_physical_samples
+from ._pyedflib import write_digital_samples, blockwrite_digital_samples, blockwrite_digital_records
+from ._pyedflib import close_file, write_annotation_latin1, write_annotation_utf8
 
 
 __all__ = ['EdfWriter']
 
 
-if sys.version_info < (3,):
-    import codecs
+# size in bytes of the file buffer, large enough to write most datarecords at once
+_WRITE_BUFFER_SIZE = 1 << 20
+
+# writeSamples converts and writes chunks of about this many bytes of
+# datarecords in parallel, with at most _PIPELINE_DEPTH chunks in flight
+_PIPELINE_CHUNK_BYTES = 4 << 20
+_PIPELINE_DEPTH = 4
+
+# birthdate written when none is set
+_DEFAULT_BIRTHDATE = date(1900, 1, 1)
+
+
+def _to_ticks(seconds):
+    """
+    Converts seconds into the integer annotation time unit of edflib (0.0001 s).
+    """
+    if isinstance(seconds, np.ndarray):
+        return np.round(seconds * 10000).astype(int)
+    return int(round(seconds * 10000))
+
+
+def _pack_int24(digital, out=None):
+    """
+    Packs int32 samples into 3 byte little endian integers as stored in BDF
+    files, returned as a flat uint8 array (@out if given).
+    """
+    packed = digital.astype('<i4', copy=False).view(np.uint8).reshape(-1, 4)[:, :3]
+    if out is None:
+        return np.ascontiguousarray(packed).ravel()
+    out.reshape(-1, 3)[:] = packed
+    return out
+
+
+class _RecordRing(object):
+    """
+    Ring of preallocated chunks of datarecords, handed from the thread that
+    converts samples to the thread that writes them. Each slot holds one
+    array per signal, all slots share one contiguous block of memory.
+    """
+    def __init__(self, sample_rates, n_records, dtype, sample_size, capacity):
+        sizes = [n_records * sr * sample_size for sr in sample_rates]
+        self.memory = np.empty(capacity * sum(sizes), dtype=dtype)
+        self.slots = [np.split(chunk, np.cumsum(sizes)[:-1])
+                      for chunk in np.split(self.memory, capacity)]
+        self.sample_rates = list(sample_rates)
+        self.n_records = n_records
+        self.sample_size = sample_size
+        self.free = queue.Queue()
+        self.filled = queue.Queue()
+        for slot in range(capacity):
+            self.free.put(slot)
 
-    def u(x):
-        return codecs.unicode_escape_decode(x)[0]
 
-    def du(x):
-        if isinstance(x, unicode):
-            return x.encode("utf-8")
-        else:
-            return x
-else:
-    def u(x):
-        return x
+class ChannelDoesNotExist(Exception):
+    def __init__(self, value):
+        self.parameter = value
 
-    def du(x):
-        return x.encode("utf-8")
+    def __str__(self):
+        return repr(self.parameter)
 
 
-class ChannelDoesNotExist(Exception):
+class WrongInputSize(Exception):
     def __init__(self, value):
         self.parameter = value
 
@@ -67,7 +114,7 @@ class ChannelDoesNotExist(Exception):
         return repr(self.parameter)
 
 
-class WrongInputSize(Exception):
+class HeaderAlreadyWritten(Exception):
     def __init__(self, value):
         self.parameter = value
 
@@ -79,6 +126,12 @@ class EdfWriter(object):
     def __exit__(self, exc_type, exc_val, ex_tb):
         self.close()  # cleanup the file
 
+    def __setattr__(self, name, value):
+        # remember which header fields have to be written by update_header
+        if name in self._header_setters:
+            self._dirty_fields.add(name)
+        object.__setattr__(self, name, value)
+
     def __init__(self, file_name, n_channels,
                  file_type=FILETYPE_EDFPLUS):
         """Initialises an EDF file at @file_name.
@@ -90,6 +143,10 @@ class EdfWriter(object):
         @n_channels is the number of channels without the annotation channel
         (only FILETYPE_EDFPLUS or FILETYPE_BDFPLUS)
 
+        The recording start time defaults to datetime.now(). When writing
+        many files, e.g. in a batch conversion, pass the start time of the
+        recording with setStartdatetime instead.
+
         @channel_info should be a
         list of dicts, one for each channel in the data. Each dict needs
         these values:
@@ -102,6 +159,7 @@ class EdfWriter(object):
             'digital_max' : maximum digital value (int, -2**15 <= x < 2**15)
             'digital_min' : minimum digital value (int, -2**15 <= x < 2**15)
         """
+        self._dirty_fields = set()
         self.path = file_name
         self.file_type = file_type
         self.patient_name = ''
@@ -113,37 +171,116 @@ class EdfWriter(object):
         self.admincode = ''
         self.gender = 0
         self.recording_start_time = datetime.now()
-        self.birthdate = date(1900, 1, 1)
+        self.birthdate = _DEFAULT_BIRTHDATE
         self.duration = 1
         self.n_channels = n_channels
-        self.channels = []
-        self.sample_buffer = []
-        for i in np.arange(self.n_channels):
-            if self.file_type == FILETYPE_EDFPLUS or self.file_type == FILETYPE_BDFPLUS:
-                self.channels.append({'label': 'test_label', 'dimension': 'mV', 'sample_rate': 100,
-                                      'physical_max': 1.0, 'physical_min': -1.0,
-                                      'digital_max': 8388607,'digital_min': -8388608,
-                                      'prefilter': 'pre1', 'transducer': 'trans1'})
-            else:
-                self.channels.append({'label': 'test_label', 'dimension': 'mV', 'sample_rate': 100,
-                                      'physical_max': 1.0, 'physical_min': -1.0,
-                                      'digital_max': 32767, 'digital_min': -32768,
-                                      'prefilter': 'pre1', 'transducer': 'trans1'})
-
-                self.sample_buffer.append([])
+        self._header_dirty = True
+        self._header_committed = False
+        self._encoded = {}
+        self._dirty_signals = np.ones(self.n_channels, dtype=bool)
+        if self._is_bdf():
+            digital_max, digital_min = 8388607, -8388608
+        else:
+            digital_max, digital_min = 32767, -32768
+        # signal parameters are stored as one array (or list) per field
+        self._sample_rate = np.full(self.n_channels, 100, dtype=np.int32)
+        self._physical_max = np.full(self.n_channels, 1.0, dtype=np.float64)
+        self._physical_min = np.full(self.n_channels, -1.0, dtype=np.float64)
+        self._digital_max = np.full(self.n_channels, digital_max, dtype=np.int32)
+        self._digital_min = np.full(self.n_channels, digital_min, dtype=np.int32)
+        self._label = ['test_label'] * self.n_channels
+        self._dimension = ['mV'] * self.n_channels
+        self._prefilter = ['pre1'] * self.n_channels
+        self._transducer = ['trans1'] * self.n_channels
+        # the record buffer is allocated by writeSamples, once the sample rates are known
+        self._buffer_sample_rates = None
+        self._sample_buffer = None
+        self._ring = None
+        # signal whose samples writePhysicalSamples/writeDigitalSamples write next
+        self._next_signal = 0
         self.handle = open_file_writeonly(self.path, self.file_type, self.n_channels)
+        set_write_buffer_size(self.handle, _WRITE_BUFFER_SIZE)
 
-    def update_header(self):
+    def _update_record_buffer(self):
         """
-        Updates header to edffile struct
+        (Re)allocates the staging buffer for one data record, int16 samples
+        for EDF and packed 3 byte samples for BDF. writeSamples calls this
+        when the sample rates changed since the last allocation.
         """
-        set_technician(self.handle, u(self.technician).encode('UTF-8'))
-        set_recording_additional(self.handle, u(self.recording_additional).encode('UTF-8'))
-        set_patientname(self.handle, u(self.patient_name).encode('UTF-8'))
-        set_patientcode(self.handle, u(self.patient_code).encode('UTF-8'))
-        set_patient_additional(self.handle, u(self.patient_additional).encode('UTF-8'))
-        set_equipment(self.handle, u(self.equipment).encode('UTF-8'))
-        set_admincode(self.handle, u(self.admincode).encode('UTF-8'))
+        self._buffer_sample_rates = self._sample_rate.tolist()
+        n_samples = sum(self._buffer_sample_rates)
+        if self._is_bdf():
+            self._record_buffer = np.empty(3 * n_samples, dtype=np.uint8)
+        else:
+            self._record_buffer = np.empty(n_samples, dtype='<i2')
+
+    @property
+    def sample_buffer(self):
+        """
+        Kept for compatibility only, the writer does not use it. Holds one
+        row of digital samples (int16 for EDF, int32 for BDF) per signal
+        with room for one data record of the fastest signal. It is allocated
+        on first access and whenever the sample rates require a larger one.
+        """
+        shape = (self.n_channels, int(self._sample_rate.max()) if self.n_channels else 0)
+        if self._sample_buffer is None or self._sample_buffer.shape != shape:
+            dtype = np.int32 if self._is_bdf() else np.int16
+            self._sample_buffer = np.zeros(shape, dtype=dtype)
+        return self._sample_buffer
+
+    def _is_bdf(self):
+        return self.file_type == FILETYPE_BDF or self.file_type == FILETYPE_BDFPLUS
+
+    @property
+    def channels(self):
+        """
+        List with one dict of signal parameters per signal. The dicts are
+        copies, changing them has no effect on the file. Use setSignalHeader
+        or the set* functions instead.
+        """
+        return [{'label': self._label[i], 'dimension': self._dimension[i],
+                 'sample_rate': int(self._sample_rate[i]),
+                 'physical_max': float(self._physical_max[i]),
+                 'physical_min': float(self._physical_min[i]),
+                 'digital_max': int(self._digital_max[i]),
+                 'digital_min': int(self._digital_min[i]),
+                 'prefilter': self._prefilter[i], 'transducer': self._transducer[i]}
+                for i in range(self.n_channels)]
+
+    def update_header(self):
+        """
+        Updates header to edffile struct. Only the header fields and signal
+        parameters that changed since the last update are written.
+
+        Raises ValueError if the parameters of a signal are invalid or
+        rejected by edflib (e.g. a digital maximum above 32767 for EDF).
+        """
+        for field in list(self._dirty_fields):
+            self._header_setters[field](self)
+        self._dirty_fields.clear()
+
+        for edfsignal in np.flatnonzero(self._dirty_signals).tolist():
+            # writeSamples converts the samples with these values, so they
+            # must be the ones edflib accepted for the header
+            if self._physical_max[edfsignal] == self._physical_min[edfsignal]:
+                raise ValueError("physical maximum of signal %d equals its physical minimum" % edfsignal)
+            if self._digital_max[edfsignal] <= self._digital_min[edfsignal]:
+                raise ValueError("digital maximum of signal %d is not larger than its digital minimum"
+                                 % edfsignal)
+            err = set_signal_header(self.handle, edfsignal, self._sample_rate[edfsignal],
+                                    self._physical_max[edfsignal], self._physical_min[edfsignal],
+                                    self._digital_max[edfsignal], self._digital_min[edfsignal],
+                                    self._encode(self._label[edfsignal]),
+                                    self._encode(self._dimension[edfsignal]),
+                                    self._encode(self._transducer[edfsignal]),
+                                    self._encode(self._prefilter[edfsignal]))
+            if err:
+                raise ValueError("edflib rejected the parameters of signal %d: %r"
+                                 % (edfsignal, self.channels[edfsignal]))
+            self._dirty_signals[edfsignal] = False
+        self._header_dirty = False
+
+    def _update_gender(self):
         if isinstance(self.gender, int):
             set_gender(self.handle, self.gender)
         elif self.gender == "Male":
@@ -151,33 +288,190 @@ class EdfWriter(object):
         elif self.gender == "Female":
             set_gender(self.handle, 1)
 
-        set_datarecord_duration(self.handle, self.duration)
+    def _update_startdatetime(self):
         set_startdatetime(self.handle, self.recording_start_time.year, self.recording_start_time.month,
                           self.recording_start_time.day, self.recording_start_time.hour,
                           self.recording_start_time.minute, self.recording_start_time.second)
+
+    def _update_birthdate(self):
         if isinstance(self.birthdate, str):
             if self.birthdate == '':
-                birthday = date(1900, 1, 1)
+                birthday = _DEFAULT_BIRTHDATE
             else:
                 birthday = datetime.strptime(self.birthdate, '%d %b %Y').date()
             set_birthdate(self.handle, birthday.year, birthday.month, birthday.day)
         else:
             set_birthdate(self.handle, self.birthdate.year, self.birthdate.month, self.birthdate.day)
-        for i in np.arange(self.n_channels):
-            set_samplefrequency(self.handle, i, self.channels[i]['sample_rate'])
-            set_physical_maximum(self.handle, i, self.channels[i]['physical_max'])
-            set_physical_minimum(self.handle, i, self.channels[i]['physical_min'])
-            set_digital_maximum(self.handle, i, self.channels[i]['digital_max'])
-            set_digital_minimum(self.handle, i, self.channels[i]['digital_min'])
-            set_label(self.handle, i, u(self.channels[i]['label']).encode('UTF-8'))
-            set_physical_dimension(self.handle, i, u(self.channels[i]['dimension']).encode('UTF-8'))
-            set_transducer(self.handle, i, u(self.channels[i]['transducer']).encode('UTF-8'))
-            set_prefilter(self.handle, i, u(self.channels[i]['prefilter']).encode('UTF-8'))
+
+    # header field -> function writing it to the edffile struct
+    _header_setters = {
+        'technician': lambda self: set_technician(self.handle, self._encode(self.technician)),
+        'recording_additional': lambda self: set_recording_additional(self.handle, self._encode(self.recording_additional)),
+        'patient_name': lambda self: set_patientname(self.handle, self._encode(self.patient_name)),
+        'patient_code': lambda self: set_patientcode(self.handle, self._encode(self.patient_code)),
+        'patient_additional': lambda self: set_patient_additional(self.handle, self._encode(self.patient_additional)),
+        'equipment': lambda self: set_equipment(self.handle, self._encode(self.equipment)),
+        'admincode': lambda self: set_admincode(self.handle, self._encode(self.admincode)),
+        'gender': _update_gender,
+        'duration': lambda self: set_datarecord_duration(self.handle, self.duration),
+        'recording_start_time': _update_startdatetime,
+        'birthdate': _update_birthdate,
+    }
+
+    def _encode(self, value):
+        """
+        Returns the UTF-8 encoded header string, the encoded bytes are cached
+        so that unchanged strings are not encoded again at every update.
+        """
+        try:
+            return self._encoded[value]
+        except KeyError:
+            # byte strings (str on Python 2) are passed on unchanged
+            encoded = self._encoded[value] = value if isinstance(value, bytes) else value.encode('UTF-8')
+            return encoded
+
+    def _physical_to_digital(self, edfsignal, data, dtype=np.int32, out=None):
+        """
+        Converts physical samples of signal edfsignal into digital samples
+        of type dtype (or into @out). For finite samples the conversion gives
+        the same values as the one done by edflib in edfwrite_physical_samples.
+        NaN is written as digital minimum, infinite and other out of range
+        values are clipped to digital minimum and digital maximum.
+        """
+        physical_max = float(self._physical_max[edfsignal])
+        physical_min = float(self._physical_min[edfsignal])
+        digital_max = int(self._digital_max[edfsignal])
+        digital_min = int(self._digital_min[edfsignal])
+        bitvalue = (physical_max - physical_min) / (digital_max - digital_min)
+        offset = physical_max / bitvalue - digital_max
+        # huge or non-finite samples must not raise warnings, they are clipped below
+        with np.errstate(over='ignore', invalid='ignore'):
+            digital = np.divide(data, bitvalue)
+            np.trunc(digital, out=digital)
+            digital -= offset
+            np.trunc(digital, out=digital)
+        np.copyto(digital, digital_min, where=np.isnan(digital))
+        np.clip(digital, digital_min, digital_max, out=digital)
+        if out is None:
+            return digital.astype(dtype)
+        np.copyto(out, digital, casting='unsafe')
+        return out
+
+    def _quantize(self, edfsignal, data, out=None):
+        """
+        Converts physical samples of signal edfsignal into the sample format
+        of the file, int16 for EDF and packed 3 byte integers for BDF.
+        """
+        if self._is_bdf():
+            return _pack_int24(self._physical_to_digital(edfsignal, data), out)
+        return self._physical_to_digital(edfsignal, data, '<i2', out)
+
+    def _get_ring(self, sr):
+        """
+        Returns the _RecordRing for the current sample rates. A chunk holds
+        at least one datarecord, even if that is larger than _PIPELINE_CHUNK_BYTES.
+        """
+        if self._is_bdf():
+            dtype, sample_size = np.uint8, 3
+        else:
+            dtype, sample_size = '<i2', 1
+        n_records = max(1, _PIPELINE_CHUNK_BYTES // (sum(sr) * sample_size * np.dtype(dtype).itemsize))
+        if self._ring is None or self._ring.sample_rates != sr or self._ring.n_records != n_records:
+            self._ring = _RecordRing(sr, n_records, dtype, sample_size, _PIPELINE_DEPTH)
+        return self._ring
+
+    def _write_records(self, signals, sr, n_records):
+        """
+        Writes @n_records datarecords of the digital @signals, raises IOError
+        if edflib fails to write them.
+        """
+        err = blockwrite_digital_records(self.handle, signals, sr, self._record_buffer, n_records)
+        if err:
+            raise IOError("writing datarecords to %s failed (edflib error %d)" % (self.path, err))
+
+    def _write_chunks(self, ring, sr, errors):
+        """
+        Writer thread of _write_records_threaded. Writes the filled slots of
+        @ring until it gets None. After an error the remaining slots are
+        only returned, the exception is stored in @errors.
+        """
+        while True:
+            item = ring.filled.get()
+            if item is None:
+                return
+            slot, n_records = item
+            if not errors:
+                try:
+                    self._write_records(ring.slots[slot], sr, n_records)
+                except Exception as e:
+                    errors.append(e)
+            ring.free.put(slot)
+
+    def _write_records_threaded(self, ring, data_list, sr, n_records):
+        """
+        Writes @n_records datarecords of @data_list. The samples of one chunk
+        are converted while the writer thread writes the previous chunks.
+        """
+        errors = []
+        writer = threading.Thread(target=self._write_chunks, args=(ring, sr, errors),
+                                  name='EdfWriter-%s' % self.path)
+        writer.daemon = True
+        writer.start()
+        try:
+            for start in range(0, n_records, ring.n_records):
+                stop = min(start + ring.n_records, n_records)
+                slot = ring.free.get()
+                if errors:
+                    ring.free.put(slot)
+                    break
+                try:
+                    for i in range(len(data_list)):
+                        out = ring.slots[slot][i][:(stop - start) * sr[i] * ring.sample_size]
+                        self._quantize(i, data_list[i][start*sr[i]:stop*sr[i]], out)
+                except BaseException:
+                    # return the slot, the ring is reused by later calls
+                    ring.free.put(slot)
+                    raise
+                ring.filled.put((slot, stop - start))
+        finally:
+            ring.filled.put(None)
+            writer.join()
+        if errors:
+            raise errors[0]
+
+    def _check_edfsignal(self, edfsignal):
+        """
+        Raises ChannelDoesNotExist if edfsignal is not a valid signal number.
+        """
+        if edfsignal < 0 or edfsignal >= self.n_channels:
+            raise ChannelDoesNotExist(edfsignal)
+
+    def _mark_signal_dirty(self, edfsignal):
+        self._dirty_signals[edfsignal] = True
+
+    def _mark_header_dirty(self):
+        """
+        Marks the header as modified. The header is written to the file only
+        once, right before the first samples are written, so it can't be
+        changed afterwards.
+        """
+        if self._header_committed:
+            raise HeaderAlreadyWritten(self.path)
+        self._header_dirty = True
+
+    def _commit_header(self):
+        """
+        Writes the header to the edffile struct if this didn't happen yet.
+        """
+        if self._header_dirty and not self._header_committed:
+            self.update_header()
+        self._header_committed = True
 
     def setHeader(self, fileHeader):
         """
         Sets the file header
         """
+        self._mark_header_dirty()
         self.technician = fileHeader["technician"]
         self.recording_additional = fileHeader["recording_additional"]
         self.patient_name = fileHeader["patientname"]
@@ -188,7 +482,6 @@ class EdfWriter(object):
         self.gender = fileHeader["gender"]
         self.recording_start_time = fileHeader["startdate"]
         self.birthdate = fileHeader["birthdate"]
-        self.update_header()
 
     def setSignalHeader(self, edfsignal, channel_info):
         """
@@ -205,10 +498,18 @@ class EdfWriter(object):
             'digital_max' : maximum digital value (int, -2**15 <= x < 2**15)
             'digital_min' : minimum digital value (int, -2**15 <= x < 2**15)
         """
-        if edfsignal < 0 or edfsignal > self.n_channels:
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal] = channel_info
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._sample_rate[edfsignal] = channel_info['sample_rate']
+        self._physical_max[edfsignal] = channel_info['physical_max']
+        self._physical_min[edfsignal] = channel_info['physical_min']
+        self._digital_max[edfsignal] = channel_info['digital_max']
+        self._digital_min[edfsignal] = channel_info['digital_min']
+        self._label[edfsignal] = channel_info['label']
+        self._dimension[edfsignal] = channel_info['dimension']
+        self._prefilter[edfsignal] = channel_info['prefilter']
+        self._transducer[edfsignal] = channel_info['transducer']
+        self._mark_signal_dirty(edfsignal)
 
     def setSignalHeaders(self, signalHeaders):
         """
@@ -233,9 +534,8 @@ class EdfWriter(object):
                 'digital_min' : int
                          minimum digital value (-2**15 <= x < 2**15)
         """
-        for edfsignal in np.arange(self.n_channels):
-            self.channels[edfsignal] = signalHeaders[edfsignal]
-        self.update_header()
+        for edfsignal in range(self.n_channels):
+            self.setSignalHeader(edfsignal, signalHeaders[edfsignal])
 
     def setTechnician(self, technician):
         """
@@ -243,8 +543,8 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
+        self._mark_header_dirty()
         self.technician = technician
-        self.update_header()
 
     def setRecordingAdditional(self, recording_additional):
         """
@@ -252,8 +552,8 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
+        self._mark_header_dirty()
         self.recording_additional = recording_additional
-        self.update_header()
 
     def setPatientName(self, patient_name):
         """
@@ -261,8 +561,8 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
+        self._mark_header_dirty()
         self.patient_name = patient_name
-        self.update_header()
 
     def setPatientCode(self, patient_code):
         """
@@ -270,8 +570,8 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
+        self._mark_header_dirty()
         self.patient_code = patient_code
-        self.update_header()
 
     def setPatientAdditional(self, patient_additional):
         """
@@ -279,8 +579,8 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
-        self.technician = patient_additional
-        self.update_header()
+        self._mark_header_dirty()
+        self.patient_additional = patient_additional
 
     def setEquipment(self, equipment):
         """
@@ -294,8 +594,8 @@ class EdfWriter(object):
                     Describes the measurement equpipment
 
         """
+        self._mark_header_dirty()
         self.equipment = equipment
-        self.update_header()
 
     def setAdmincode(self, admincode):
         """
@@ -309,8 +609,8 @@ class EdfWriter(object):
                    admincode which is written into the header
 
         """
+        self._mark_header_dirty()
         self.admincode = admincode
-        self.update_header()
 
     def setGender(self, gender):
         """
@@ -323,8 +623,8 @@ class EdfWriter(object):
         gender : int
                  1 is male, 0 is female
         """
+        self._mark_header_dirty()
         self.gender = gender
-        self.update_header()
 
     def setDatarecordDuration(self, duration):
         """
@@ -342,16 +642,18 @@ class EdfWriter(object):
         the datarecord duration to 10 seconds. Do not use this function,
         except when absolutely necessary!
         """
+        self._mark_header_dirty()
         self.duration = duration
-        self.update_header()
 
     def setStartdatetime(self, recording_start_time):
         """
         Sets the recording start Time
-        :param recording_start_time:
+        :param recording_start_time: datetime object, defaults to the time
+            the EdfWriter was created. Batch conversions should always set
+            the start time of the original recording here.
         """
+        self._mark_header_dirty()
         self.recording_start_time = recording_start_time
-        self.update_header()
 
     def setBirthdate(self, birthdate):
         """
@@ -361,8 +663,8 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
+        self._mark_header_dirty()
         self.birthdate = birthdate
-        self.update_header()
 
     def setSamplefrequency(self, edfsignal, samplefrequency):
         """
@@ -370,10 +672,10 @@ class EdfWriter(object):
 
         This function is required for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if edfsignal < 0 or edfsignal > self.n_channels:
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['sample_rate'] = samplefrequency
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._sample_rate[edfsignal] = samplefrequency
+        self._mark_signal_dirty(edfsignal)
 
     def setPhysicalMaximum(self, edfsignal, physical_maximum):
         """
@@ -384,10 +686,10 @@ class EdfWriter(object):
 
         This function is required for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if edfsignal < 0 or edfsignal > self.n_channels:
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['physical_max'] = physical_maximum
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._physical_max[edfsignal] = physical_maximum
+        self._mark_signal_dirty(edfsignal)
 
     def setPhysicalMinimum(self, edfsignal, physical_minimum):
         """
@@ -398,10 +700,10 @@ class EdfWriter(object):
 
         This function is required for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if (edfsignal < 0 or edfsignal > self.n_channels):
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['physical_min'] = physical_minimum
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._physical_min[edfsignal] = physical_minimum
+        self._mark_signal_dirty(edfsignal)
 
     def setDigitalMaximum(self, edfsignal, digital_maximum):
         """
@@ -413,10 +715,10 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if (edfsignal < 0 or edfsignal > self.n_channels):
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['digital_max'] = digital_maximum
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._digital_max[edfsignal] = digital_maximum
+        self._mark_signal_dirty(edfsignal)
 
     def setDigitalMinimum(self, edfsignal, digital_minimum):
         """
@@ -428,10 +730,10 @@ class EdfWriter(object):
 
         This function is optional and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if (edfsignal < 0 or edfsignal > self.n_channels):
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['digital_min'] = digital_minimum
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._digital_min[edfsignal] = digital_minimum
+        self._mark_signal_dirty(edfsignal)
 
     def setLabel(self, edfsignal, label):
         """
@@ -442,10 +744,10 @@ class EdfWriter(object):
 
         This function is recommended for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if (edfsignal < 0 or edfsignal > self.n_channels):
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['label'] = label
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._label[edfsignal] = label
+        self._mark_signal_dirty(edfsignal)
 
     def setPhysicalDimension(self, edfsignal, physical_dimension):
         """
@@ -456,10 +758,10 @@ class EdfWriter(object):
 
         This function is recommended for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if edfsignal < 0 or edfsignal > self.n_channels:
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['dimension'] = physical_dimension
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._dimension[edfsignal] = physical_dimension
+        self._mark_signal_dirty(edfsignal)
 
     def setTransducer(self, edfsignal, transducer):
         """
@@ -470,10 +772,10 @@ class EdfWriter(object):
 
         This function is optional for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if (edfsignal < 0 or edfsignal > self.n_channels):
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['transducer'] = transducer
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._transducer[edfsignal] = transducer
+        self._mark_signal_dirty(edfsignal)
 
     def setPrefilter(self, edfsignal, prefilter):
         """
@@ -484,10 +786,10 @@ class EdfWriter(object):
 
         This function is optional for every signal and can be called only after opening a file in writemode and before the first sample write action.
         """
-        if edfsignal < 0 or edfsignal > self.n_channels:
-            raise ChannelDoesNotExist(edfsignal)
-        self.channels[edfsignal]['prefilter'] = prefilter
-        self.update_header()
+        self._check_edfsignal(edfsignal)
+        self._mark_header_dirty()
+        self._prefilter[edfsignal] = prefilter
+        self._mark_signal_dirty(edfsignal)
 
     def writePhysicalSamples(self, data):
         """
@@ -507,7 +809,65 @@ class EdfWriter(object):
 
         All parameters must be already written into the bdf/edf-file.
         """
-        return write_physical_samples(self.handle, data)
+        if not self._header_committed:
+            self._commit_header()
+        err = write_physical_samples(self.handle, np.ascontiguousarray(data, dtype=np.float64).ravel())
+        if not err:
+            self._next_signal = (self._next_signal + 1) % self.n_channels
+        return err
+
+    def blockWritePhysicalSamples(self, data):
+        """
+        Writes physical samples (uV, mA, Ohm) belonging to all signals for one
+        complete datarecord.
+
+        @data must hold the samples of signal 0, signal 1, signal 2, etc.
+        one after another. The number of samples of each signal must be equal
+        to its samplefrequency, so the size of data is the sum of all
+        samplefrequencies.
+
+        The physical samples will be converted to digital samples using the
+        values of physical maximum, physical minimum, digital maximum and
+        digital minimum. This function can only be used when no data
+        record is partially written by writePhysicalSamples.
+
+        All parameters must be already written into the bdf/edf-file.
+        """
+        if not self._header_committed:
+            self._commit_header()
+        return blockwrite_physical_samples(self.handle, np.ascontiguousarray(data, dtype=np.float64).ravel())
+
+    def writeDigitalSamples(self, data):
+        """
+        Writes n digital samples belonging to one signal where n is the
+        samplefrequency of the signal.
+
+        The samples are written without conversion, values outside of
+        digital minimum and digital maximum are clipped. Call this function
+        for every signal in the file, in the same order as writePhysicalSamples.
+
+        All parameters must be already written into the bdf/edf-file.
+        """
+        if not self._header_committed:
+            self._commit_header()
+        err = write_digital_samples(self.handle, np.ascontiguousarray(data, dtype=np.int32).ravel())
+        if not err:
+            self._next_signal = (self._next_signal + 1) % self.n_channels
+        return err
+
+    def blockWriteDigitalSamples(self, data):
+        """
+        Writes digital samples belonging to all signals for one complete
+        datarecord, see blockWritePhysicalSamples for the layout of @data.
+
+        The samples are written without conversion, values outside of
+        digital minimum and digital maximum are clipped.
+
+        All parameters must be already written into the bdf/edf-file.
+        """
+        if not self._header_committed:
+            self._commit_header()
+        return blockwrite_digital_samples(self.handle, np.ascontiguousarray(data, dtype=np.int32).ravel())
 
     def writeSamples(self, data_list):
         """
@@ -520,54 +880,78 @@ class EdfWriter(object):
         samplefrequencys. The data is saved as list. Each list entry contains
         a vector with the data of one signal.
 
+        Samples outside of physical minimum and physical maximum, including
+        infinite values, are clipped. NaN samples (e.g. missing data) are
+        written as digital minimum.
+
+        writeSamples writes complete data records, so it can't be used while
+        a data record is partially written by writePhysicalSamples or
+        writeDigitalSamples (IOError is raised). Write the samples of the
+        remaining signals of that record first.
+
         All parameters must be already written into the bdf/edf-file.
         """
 
-        if (len(data_list) != len(self.channels)):
+        if (len(data_list) != self.n_channels):
             raise WrongInputSize(len(data_list))
-
-        ind = []
-        notAtEnd = True
-        for i in np.arange(len(data_list)):
-            ind.append(0)
-
-        for i in np.arange(len(data_list)):
-            if (np.size(data_list[i]) < ind[i] + self.channels[i]['sample_rate']):
-                notAtEnd = False
-
-        while notAtEnd:
-            for i in np.arange(len(data_list)):
-                self.writePhysicalSamples(data_list[i].flatten()[ind[i]:ind[i]+self.channels[i]['sample_rate']])
-                ind[i] += self.channels[i]['sample_rate']
-
-            for i in np.arange(len(data_list)):
-                if (np.size(data_list[i]) < ind[i] + self.channels[i]['sample_rate']):
-                    notAtEnd = False
-
-        for i in np.arange(len(data_list)):
-            lastSamples = np.zeros(self.channels[i]['sample_rate'])
-            lastSampleInd = np.max(data_list[i].shape) - ind[i]
-            if lastSampleInd > 0:
-                lastSamples[:lastSampleInd] = data_list[i].flatten()[-lastSampleInd:]
-                self.writePhysicalSamples(lastSamples)
+        if self._next_signal:
+            raise IOError("a data record of %s is partially written, samples of signals 0 to %d "
+                          "were written by writePhysicalSamples/writeDigitalSamples"
+                          % (self.path, self._next_signal - 1))
+
+        # ravel only copies if the data is not already contiguous float64
+        n_signals = len(data_list)
+        data_list = [np.ascontiguousarray(data_list[i], dtype=np.float64).ravel() for i in range(n_signals)]
+        sr = self._sample_rate.tolist()
+        n_records = min(data_list[i].size // sr[i] for i in range(n_signals))
+
+        if self._buffer_sample_rates != sr:
+            self._update_record_buffer()
+
+        if not self._header_committed:
+            self._commit_header()
+        # the memory used for the conversion is bounded by the size of one chunk of the ring
+        ring = self._get_ring(sr)
+        if n_records > ring.n_records:
+            self._write_records_threaded(ring, data_list, sr, n_records)
+        else:
+            # all complete records fit into one chunk, they are converted at once
+            digital = [self._quantize(i, data_list[i][:n_records*sr[i]]) for i in range(n_signals)]
+            self._write_records(digital, sr, n_records)
+
+        lastSampleInd = [data_list[i].size - n_records*sr[i] for i in range(n_signals)]
+        if max(lastSampleInd) > 0:
+            lastSamples = []
+            for i in range(n_signals):
+                lastSamples.append(np.zeros(sr[i]))
+                lastSamples[i][:lastSampleInd[i]] = data_list[i][n_records*sr[i]:]
+            digital = [self._quantize(i, lastSamples[i]) for i in range(n_signals)]
+            self._write_records(digital, sr, 1)
 
     def writeAnnotation(self, onset_in_seconds, duration_in_seconds, description, str_format='utf-8'):
         """
         Writes an annotation/event to the file
         """
+        onset = _to_ticks(onset_in_seconds)
+        if duration_in_seconds >= 0:
+            duration = _to_ticks(duration_in_seconds)
+        else:
+            duration = -1
         if str_format == 'utf-8':
-            if duration_in_seconds >= 0:
-                return write_annotation_utf8(self.handle, np.round(onset_in_seconds*10000).astype(int), np.round(duration_in_seconds*10000).astype(int), du(description))
-            else:
-                return write_annotation_utf8(self.handle, np.round(onset_in_seconds*10000).astype(int), -1, du(description))
+            if not isinstance(description, bytes):
+                description = description.encode('utf-8')
+            return write_annotation_utf8(self.handle, onset, duration, description)
         else:
-            if duration_in_seconds >= 0:
-                return write_annotation_latin1(self.handle, np.round(onset_in_seconds*10000).astype(int), np.round(duration_in_seconds*10000).astype(int), u(description).encode('latin1'))
-            else:
-                return write_annotation_latin1(self.handle, np.round(onset_in_seconds*10000).astype(int), -1, u(description).encode('latin1'))
+            if not isinstance(description, bytes):
+                description = description.encode('latin1')
+            return write_annotation_latin1(self.handle, onset, duration, description)
 
     def close(self):
         """
         Closes the file.
         """
-        close_file(self.handle)
+        try:
+            self._commit_header()
+        finally:
+            close_file(self.handle)
+            self._ring = None
@@ -28,17 +28,20 @@ __doc__ = """Pyrex wrapper for low-level C edflib implementation."""
 __all__ = ['lib_version', 'CyEdfReader', 'set_patientcode', 
            'write_annotation_latin1', 'write_annotation_utf8', 'set_technician', 'EdfAnnotation',
            'get_annotation', 'read_int_samples', 'blockwrite_digital_samples', 'blockwrite_physical_samples',
+           'blockwrite_digital_records',
            'set_recording_additional', 'write_physical_samples' ,'set_patientname', 'set_physical_minimum', 
            'read_physical_samples', 'close_file', 'set_physical_maximum', 'open_file_writeonly', 
            'set_patient_additional', 'set_digital_maximum', 'set_birthdate', 'set_digital_minimum',
            'write_digital_samples', 'set_equipment', 'set_samplefrequency','set_admincode', 'set_label',
            'tell', 'rewind', 'set_gender','set_physical_dimension', 'set_transducer', 'set_prefilter',
-           'seek', 'set_startdatetime' ,'set_datarecord_duration', 'open_errors', 'FILETYPE_EDFPLUS',
+           'seek', 'set_startdatetime' ,'set_datarecord_duration', 'set_write_buffer_size', 'set_signal_header', 'open_errors', 'FILETYPE_EDFPLUS',
            'FILETYPE_EDF','FILETYPE_BDF','FILETYPE_BDFPLUS']
 
 
 from c_edf cimport *
 cimport cpython
+from libc.stdlib cimport malloc, free
+from libc.string cimport memcpy
 import numpy as np
 cimport numpy as np
 from datetime import datetime, date
@@ -381,16 +384,72 @@ cpdef read_int_samples(int handle, int edfsignal, int n,
     """
     return edfread_digital_samples(handle, edfsignal, n,<int*>buf.data)
 
-cpdef int blockwrite_digital_samples(int handle, np.ndarray[np.int16_t,ndim=1] buf):
+cpdef int blockwrite_digital_samples(int handle, np.ndarray[np.int32_t,ndim=1,mode="c"] buf):
     return edf_blockwrite_digital_samples(handle, <int*>buf.data)
 
-cpdef int blockwrite_physical_samples(int handle, np.ndarray[np.float64_t,ndim=1] buf):
+cpdef int blockwrite_physical_samples(int handle, np.ndarray[np.float64_t,ndim=1,mode="c"] buf):
     return edf_blockwrite_physical_samples(handle, <double*>buf.data)
 
+def blockwrite_digital_records(int handle, signals, sample_rates, np.ndarray buf, long long n_records):
+    """writes @n_records complete datarecords from the list of contiguous arrays
+    @signals (one per signal) with @sample_rates samples per record each.
+    For EDF the signals and @buf are little endian int16 arrays, for BDF they are uint8 arrays
+    holding the samples as packed 3 byte little endian integers.
+    @buf is the staging buffer for one datarecord, it holds sum(sample_rates) samples.
+    returns 0 on success or the error of the edflib blockwrite function
+    """
+    cdef int n = len(signals)
+    cdef int i, err = 0
+    cdef int sample_size
+    cdef long long rec
+    cdef Py_ssize_t offset, total = np.sum(sample_rates)
+    cdef int[::1] sr = np.ascontiguousarray(sample_rates, dtype=np.intc)
+    cdef const unsigned char[::1] sig
+    cdef const unsigned char **src
+    cdef unsigned char *dest = <unsigned char *>buf.data
+
+    if buf.dtype == np.dtype('<i2'):
+        sample_size = 2
+    elif buf.dtype == np.uint8:
+        sample_size = 3
+    else:
+        raise TypeError("buf must be a little endian int16 (EDF) or uint8 (BDF) array")
+    if n_records <= 0:
+        return 0
+    if sr.shape[0] != n or not buf.flags.c_contiguous or buf.nbytes != total * sample_size:
+        raise ValueError("sample_rates and buf do not match the number of signals")
+    src = <const unsigned char **>malloc(n * sizeof(unsigned char *))
+    if src == NULL:
+        raise MemoryError()
+    # the byte views keep possibly copied signals alive while src points into them
+    views = [np.ascontiguousarray(signal).view(np.uint8) for signal in signals]
+    try:
+        for i in range(n):
+            sig = views[i]
+            if sig.shape[0] < n_records * sr[i] * sample_size:
+                raise ValueError("signal %d holds less than %d datarecords" % (i, n_records))
+            src[i] = &sig[0]
+        # the GIL is released so that other threads can convert the next samples
+        with nogil:
+            for rec in range(n_records):
+                offset = 0
+                for i in range(n):
+                    memcpy(dest + offset, src[i] + rec * sr[i] * sample_size, sr[i] * sample_size)
+                    offset += sr[i] * sample_size
+                if sample_size == 2:
+                    err = edf_blockwrite_digital_2byte_samples(handle, dest)
+                else:
+                    err = edf_blockwrite_digital_3byte_samples(handle, dest)
+                if err:
+                    break
+    finally:
+        free(src)
+    return err
+
 cpdef int set_recording_additional(int handle, char *recording_additional):
     return edf_set_recording_additional(handle,recording_additional)
 
-cpdef int write_physical_samples(int handle, np.ndarray[np.float64_t] buf):
+cpdef int write_physical_samples(int handle, np.ndarray[np.float64_t,ndim=1,mode="c"] buf):
     return edfwrite_physical_samples(handle, <double *>buf.data)
 
 
@@ -435,7 +494,7 @@ def set_digital_minimum(handle, edfsignal, dig_min):
     """int edf_set_digital_minimum(int handle, int edfsignal, int dig_min)"""
     return edf_set_digital_minimum(handle,  edfsignal, dig_min)
 
-def write_digital_samples(handle, np.ndarray[np.int32_t] buf):
+def write_digital_samples(handle, np.ndarray[np.int32_t,ndim=1,mode="c"] buf):
     """write_digital_samples(int handle, np.ndarray[np.int32_t] buf)"""
     return edfwrite_digital_samples(handle, <int*>buf.data)
 
@@ -481,6 +540,23 @@ def set_prefilter(handle, edfsignal, prefilter):
     """int edf_set_prefilter(int handle, int edfsignal, const char*prefilter)"""
     return edf_set_prefilter(handle, edfsignal, prefilter)
 
+def set_signal_header(int handle, int edfsignal, int samplefrequency, double phys_max, double phys_min,
+                      int dig_max, int dig_min, char *label, char *phys_dim, char *transducer, char *prefilter):
+    """sets all parameters of signal @edfsignal at once,
+    returns 0 on success or -1 if one of the edf_set_* functions failed
+    """
+    cdef int err = 0
+    err |= edf_set_samplefrequency(handle, edfsignal, samplefrequency)
+    err |= edf_set_physical_maximum(handle, edfsignal, phys_max)
+    err |= edf_set_physical_minimum(handle, edfsignal, phys_min)
+    err |= edf_set_digital_maximum(handle, edfsignal, dig_max)
+    err |= edf_set_digital_minimum(handle, edfsignal, dig_min)
+    err |= edf_set_label(handle, edfsignal, label)
+    err |= edf_set_physical_dimension(handle, edfsignal, phys_dim)
+    err |= edf_set_transducer(handle, edfsignal, transducer)
+    err |= edf_set_prefilter(handle, edfsignal, prefilter)
+    return -1 if err else 0
+
 def seek(handle, edfsignal, offset, whence):
     """long long edfseek(int handle, int edfsignal, long long offset, int whence)"""
     return edfseek(handle, edfsignal, offset, whence)
@@ -497,3 +573,6 @@ def set_datarecord_duration(handle, duration):
     """int edf_set_datarecord_duration(int handle, int duration)"""
     return edf_set_datarecord_duration(handle, duration)
 
+def set_write_buffer_size(handle, size):
+    """int edf_set_write_buffer_size(int handle, int size)"""
+    return edf_set_write_buffer_size(handle, size)
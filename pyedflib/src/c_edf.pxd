@@ -109,6 +109,8 @@ cdef extern from "edflib.h":
     long long int edfseek(int, int, long long int, int)
     int edf_set_startdatetime(int, int, int, int, int, int, int)
     int edf_set_datarecord_duration(int, int)
+    int edf_set_write_buffer_size(int, int)
+    int edf_blockwrite_digital_2byte_samples(int, void *) nogil
 
     # new functions in 1.10
     int edflib_is_file_used(const char *)
@@ -116,4 +118,4 @@ cdef extern from "edflib.h":
     int edflib_get_handle(int)
     int edfwrite_digital_short_samples(int , short *)
     int edf_blockwrite_digital_short_samples(int, short *)
-    int edf_blockwrite_digital_3byte_samples(int , void *)
\ No newline at end of file
+    int edf_blockwrite_digital_3byte_samples(int , void *) nogil
\ No newline at end of file
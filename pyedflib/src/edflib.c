@@ -147,6 +147,7 @@ struct edfhdrblock{
         int       annotlist_sz;
         int       total_annot_bytes;
         int       eq_sf;
+        char      *write_buffer;
         struct edfparamblock *edfparam;
       };
 
@@ -648,6 +649,8 @@ int edfclose_file(int handle)
 
   fclose(hdr->file_hdl);
 
+  free(hdr->write_buffer);
+
   free(hdr->edfparam);
 
   free(hdr);
@@ -3845,6 +3848,69 @@ int edf_set_datarecord_duration(int handle, int duration)
 }
 
 
+int edf_set_write_buffer_size(int handle, int size)
+{
+  char *buf;
+
+  if(handle<0)
+  {
+    return(-1);
+  }
+
+  if(handle>=EDFLIB_MAXFILES)
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]==NULL)
+  {
+    return(-1);
+  }
+
+  if(!(hdrlist[handle]->writemode))
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]->datarecords)
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]->signal_write_sequence_pos)
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]->write_buffer!=NULL)
+  {
+    return(-1);
+  }
+
+  if(size < 1)
+  {
+    return(-1);
+  }
+
+  buf = (char *)malloc(size);
+  if(buf==NULL)
+  {
+    return(-1);
+  }
+
+  if(setvbuf(hdrlist[handle]->file_hdl, buf, _IOFBF, size))
+  {
+    free(buf);
+
+    return(-1);
+  }
+
+  hdrlist[handle]->write_buffer = buf;
+
+  return(0);
+}
+
+
 int edfwrite_digital_short_samples(int handle, short *buf)
 {
   int  i, p,
@@ -4446,6 +4512,102 @@ int edf_blockwrite_digital_3byte_samples(int handle, void *buf)
 }
 
 
+int edf_blockwrite_digital_2byte_samples(int handle, void *buf)
+{
+  int  j, p,
+       error,
+       edfsignals,
+       total_samples=0;
+
+  FILE *file;
+
+  struct edfhdrblock *hdr;
+
+
+  if(handle<0)
+  {
+    return(-1);
+  }
+
+  if(handle>=EDFLIB_MAXFILES)
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]==NULL)
+  {
+    return(-1);
+  }
+
+  if(!(hdrlist[handle]->writemode))
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]->signal_write_sequence_pos)
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]->edfsignals == 0)
+  {
+    return(-1);
+  }
+
+  if(hdrlist[handle]->bdf == 1)
+  {
+    return(-1);
+  }
+
+  hdr = hdrlist[handle];
+
+  file = hdr->file_hdl;
+
+  edfsignals = hdr->edfsignals;
+
+  if(!hdr->datarecords)
+  {
+    error = edflib_write_edf_header(hdr);
+
+    if(error)
+    {
+      return(error);
+    }
+  }
+
+  for(j=0; j<edfsignals; j++)
+  {
+    total_samples += hdr->edfparam[j].smp_per_record;
+  }
+
+  if(fwrite(buf, total_samples * 2, 1, file) != 1)
+  {
+    return(-1);
+  }
+
+  p = edflib_fprint_ll_number_nonlocalized(file, (hdr->datarecords * hdr->long_data_record_duration) / EDFLIB_TIME_DIMENSION, 0, 1);
+  if(hdr->long_data_record_duration % EDFLIB_TIME_DIMENSION)
+  {
+    fputc('.', file);
+    p++;
+    p += edflib_fprint_ll_number_nonlocalized(file, (hdr->datarecords * hdr->long_data_record_duration) % EDFLIB_TIME_DIMENSION, 7, 0);
+  }
+  fputc(20, file);
+  fputc(20, file);
+  p += 2;
+  for(; p<hdr->total_annot_bytes; p++)
+  {
+    fputc(0, file);
+  }
+
+  hdr->datarecords++;
+
+  fflush(file);
+
+  return(0);
+}
+
+
 int edfwrite_physical_samples(int handle, double *buf)
 {
   int  i, p,
@@ -612,6 +612,29 @@ int edf_set_number_of_annotation_signals(int handle, int annot_signals);
 /* this function to increase the storage space for annotations */
 /* Minimum is 1, maximum is 64 */
 
+int edf_set_write_buffer_size(int handle, int size);
+
+/* Sets the size in bytes of the buffer used for writing the file. */
+/* By default the buffer of the C library is used, which is usually only a few kilobytes, */
+/* so writing a large datarecord results in many small write calls. */
+/* A buffer of at least the size of one datarecord reduces this to one write call per datarecord. */
+/* Returns 0 on success, otherwise -1 */
+/* This function is optional and can be called only once after opening a file in writemode */
+/* and before the first sample write action */
+
+int edf_blockwrite_digital_2byte_samples(int handle, void *buf);
+
+/* Writes "raw" digital samples from *buf. */
+/* buf must be filled with samples from all signals, starting with n samples of signal 0, n samples of signal 1, n samples of signal 2, etc. */
+/* where n is the samplefrequency of that signal. */
+/* One block equals one second. One sample equals 2 bytes, order is little endian (least significant byte first) */
+/* Encoding is second's complement, most significant bit of most significant byte is the sign-bit */
+/* The samples will be written to the file without any conversion. */
+/* Because the size of a 2-byte sample is 16-bit, this function can only be used when writing an EDF file */
+/* The number of samples written is equal to the sum of the samplefrequencies of all signals. */
+/* Size of buf should be equal to or bigger than: the sum of the samplefrequencies of all signals x 2 bytes */
+/* Returns 0 on success, otherwise -1 */
+
 
 #ifdef __cplusplus
 } /* extern "C" */
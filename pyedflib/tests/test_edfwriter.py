@@ -3,6 +3,7 @@
 from __future__ import division, print_function, absolute_import
 
 import os
+import warnings
 import numpy as np
 # from numpy.testing import (assert_raises, run_module_suite,
 #                            assert_equal, assert_allclose, assert_almost_equal)
@@ -76,6 +77,274 @@ class TestEdfWriter(unittest.TestCase):
         np.testing.assert_almost_equal(data1, data1_read)
         np.testing.assert_almost_equal(data2, data2_read)
 
+    def test_HeaderWriting(self):
+        f = pyedflib.EdfWriter(self.bdf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_BDFPLUS)
+        f.setTechnician('tec1')
+        f.setPatientName('name1')
+        f.setPatientAdditional('pat1')
+        for i in range(2):
+            f.setLabel(i, 'label%d' % i)
+            f.setSamplefrequency(i, 200)
+            f.setPhysicalDimension(i, 'uV')
+        np.testing.assert_equal(f.channels[1]['label'], 'label1')
+        np.testing.assert_equal(f.channels[1]['sample_rate'], 200)
+        np.testing.assert_raises(pyedflib.edfwriter.ChannelDoesNotExist,
+                                 f.setLabel, 2, 'label2')
+        np.testing.assert_raises(pyedflib.edfwriter.ChannelDoesNotExist,
+                                 f.setLabel, -1, 'label2')
+        data_list = [np.ones(400) * 0.1, np.ones(400) * 0.2]
+        f.writeSamples(data_list)
+        np.testing.assert_raises(pyedflib.edfwriter.HeaderAlreadyWritten,
+                                 f.setTechnician, 'tec2')
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.bdf_data_file)
+        np.testing.assert_equal(f.technician.rstrip(), b'tec1')
+        np.testing.assert_equal(f.getPatientAdditional(), b'pat1')
+        for i in range(2):
+            np.testing.assert_equal(f.getLabel(i), ('label%d' % i).encode('ascii'))
+            np.testing.assert_equal(f.getPhysicalDimension(i), b'uV')
+            np.testing.assert_equal(f.getSampleFrequency(i), 200)
+        np.testing.assert_almost_equal(f.readSignal(1), data_list[1])
+        f._close()
+        del f
+
+    def test_SampleWritingLastRecord(self):
+        f = pyedflib.EdfWriter(self.bdf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_BDFPLUS)
+        f.setSamplefrequency(0, 100)
+        f.setSamplefrequency(1, 200)
+
+        data1 = np.ones(250) * 0.1
+        data2 = np.ones(500) * 0.2
+        f.writeSamples([data1, data2])
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.bdf_data_file)
+        data1_read = f.readSignal(0)
+        data2_read = f.readSignal(1)
+        f._close()
+        del f
+        np.testing.assert_equal(len(data1_read), 300)
+        np.testing.assert_equal(len(data2_read), 600)
+        np.testing.assert_almost_equal(data1_read[:250], data1)
+        np.testing.assert_almost_equal(data1_read[250:], 0)
+        np.testing.assert_almost_equal(data2_read[:500], data2)
+        np.testing.assert_almost_equal(data2_read[500:], 0)
+
+    def test_SampleWritingNonContiguous(self):
+        f = pyedflib.EdfWriter(self.bdf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_BDFPLUS)
+        data = np.linspace(-0.5, 0.5, 600).reshape(300, 2)
+        f.writeSamples([data[:, 0], data[:, 1]])
+        f.writePhysicalSamples(data[:200:2, 0])
+        f.writePhysicalSamples(data[:200:2, 1])
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.bdf_data_file)
+        data1_read = f.readSignal(0)
+        data2_read = f.readSignal(1)
+        f._close()
+        del f
+        np.testing.assert_almost_equal(data1_read[:300], data[:, 0], decimal=6)
+        np.testing.assert_almost_equal(data2_read[:300], data[:, 1], decimal=6)
+        np.testing.assert_almost_equal(data1_read[300:], data[:200:2, 0], decimal=6)
+        np.testing.assert_almost_equal(data2_read[300:], data[:200:2, 1], decimal=6)
+
+    def test_SampleWritingPartialRecord(self):
+        f = pyedflib.EdfWriter(self.bdf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_BDFPLUS)
+        data1 = np.linspace(-1, 1, 200)
+        data2 = np.linspace(1, -1, 200)
+        f.writePhysicalSamples(data1[:100])
+        self.assertRaises(IOError, f.writeSamples, [data1[100:], data2[100:]])
+        f.writePhysicalSamples(data2[:100])
+        f.writeSamples([data1[100:], data2[100:]])
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.bdf_data_file)
+        data1_read = f.readSignal(0)
+        data2_read = f.readSignal(1)
+        f._close()
+        del f
+        np.testing.assert_almost_equal(data1_read, data1, decimal=6)
+        np.testing.assert_almost_equal(data2_read, data2, decimal=6)
+
+    def test_SampleWritingThreaded(self):
+        # small chunks, so that writeSamples converts and writes in parallel
+        # (100 bytes is less than one datarecord, then each chunk holds one record)
+        chunk_bytes = pyedflib.edfwriter._PIPELINE_CHUNK_BYTES
+        try:
+            for file_name, file_type, pipeline_chunk_bytes in [
+                    (self.bdf_data_file, pyedflib.FILETYPE_BDFPLUS, 1000),
+                    (self.edf_data_file, pyedflib.FILETYPE_EDFPLUS, 1000),
+                    (self.bdf_data_file, pyedflib.FILETYPE_BDFPLUS, 100)]:
+                pyedflib.edfwriter._PIPELINE_CHUNK_BYTES = pipeline_chunk_bytes
+                f = pyedflib.EdfWriter(file_name, 2, file_type=file_type)
+                f.setSamplefrequency(1, 200)
+                for i in range(2):
+                    f.setDigitalMaximum(i, 32767)
+                    f.setDigitalMinimum(i, -32768)
+                data1 = np.linspace(-1, 1, 2500)
+                data2 = np.linspace(1, -1, 5000)
+                f.writeSamples([data1, data2])
+                f.close()
+                del f
+
+                f = pyedflib.EdfReader(file_name)
+                data1_read = f.readSignal(0)
+                data2_read = f.readSignal(1)
+                f._close()
+                del f
+                np.testing.assert_allclose(data1_read, data1, atol=1e-4)
+                np.testing.assert_allclose(data2_read, data2, atol=1e-4)
+        finally:
+            pyedflib.edfwriter._PIPELINE_CHUNK_BYTES = chunk_bytes
+
+    def test_SampleWritingThreadedError(self):
+        chunk_bytes = pyedflib.edfwriter._PIPELINE_CHUNK_BYTES
+        blockwrite = pyedflib.edfwriter.blockwrite_digital_records
+        pyedflib.edfwriter._PIPELINE_CHUNK_BYTES = 1000
+
+        def failing_blockwrite(*args):
+            raise IOError('write failed')
+
+        f = pyedflib.EdfWriter(self.bdf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_BDFPLUS)
+        data = [np.zeros(5000), np.zeros(5000)]
+        try:
+            pyedflib.edfwriter.blockwrite_digital_records = failing_blockwrite
+            # more failing calls than slots in the ring
+            for i in range(pyedflib.edfwriter._PIPELINE_DEPTH + 1):
+                self.assertRaises(IOError, f.writeSamples, data)
+            pyedflib.edfwriter.blockwrite_digital_records = blockwrite
+            f.writeSamples(data)
+        finally:
+            pyedflib.edfwriter.blockwrite_digital_records = blockwrite
+            pyedflib.edfwriter._PIPELINE_CHUNK_BYTES = chunk_bytes
+            f.close()
+
+    def test_SampleWritingErrorCode(self):
+        chunk_bytes = pyedflib.edfwriter._PIPELINE_CHUNK_BYTES
+        blockwrite = pyedflib.edfwriter.blockwrite_digital_records
+        pyedflib.edfwriter._PIPELINE_CHUNK_BYTES = 1000
+        calls = []
+
+        def failing_blockwrite(*args):
+            calls.append(args)
+            return -1
+
+        f = pyedflib.EdfWriter(self.bdf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_BDFPLUS)
+        try:
+            pyedflib.edfwriter.blockwrite_digital_records = failing_blockwrite
+            # one record, written without the writer thread
+            self.assertRaises(IOError, f.writeSamples, [np.zeros(100), np.zeros(100)])
+            # many chunks, no chunk is written after the failed one
+            del calls[:]
+            self.assertRaises(IOError, f.writeSamples, [np.zeros(5000), np.zeros(5000)])
+            np.testing.assert_equal(len(calls), 1)
+        finally:
+            pyedflib.edfwriter.blockwrite_digital_records = blockwrite
+            pyedflib.edfwriter._PIPELINE_CHUNK_BYTES = chunk_bytes
+            f.close()
+
+    def test_SampleWritingDefaultHeader(self):
+        f = pyedflib.EdfWriter(self.edf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_EDFPLUS)
+        np.testing.assert_equal(f.sample_buffer.shape, (2, 100))
+        f.setSamplefrequency(0, 150)
+        f.setSamplefrequency(1, 50)
+        np.testing.assert_equal(f.sample_buffer.shape, (2, 150))
+        f.setSamplefrequency(0, 100)
+        f.setSamplefrequency(1, 200)
+        np.testing.assert_equal(f.sample_buffer.shape, (2, 200))
+        np.testing.assert_equal(f.sample_buffer.dtype, np.int16)
+        data1 = np.linspace(-1, 1, 100)
+        data2 = np.linspace(1, -1, 200)
+        f.writeSamples([data1, data2])
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.edf_data_file)
+        np.testing.assert_equal(f.getDigitalMaximum(0), 32767)
+        np.testing.assert_equal(f.getDigitalMinimum(0), -32768)
+        data1_read = f.readSignal(0)
+        data2_read = f.readSignal(1)
+        f._close()
+        del f
+        np.testing.assert_allclose(data1_read, data1, atol=1e-4)
+        np.testing.assert_allclose(data2_read, data2, atol=1e-4)
+
+    def test_SampleWritingNonFinite(self):
+        for file_name, file_type in [(self.bdf_data_file, pyedflib.FILETYPE_BDFPLUS),
+                                     (self.edf_data_file, pyedflib.FILETYPE_EDFPLUS)]:
+            f = pyedflib.EdfWriter(file_name, 1, file_type=file_type)
+            data = np.zeros(100)
+            data[:5] = [np.nan, np.inf, -np.inf, 1e300, -1e300]
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                f.writeSamples([data])
+            f.close()
+            del f
+
+            f = pyedflib.EdfReader(file_name)
+            data_read = f.readSignal(0)
+            f._close()
+            del f
+            np.testing.assert_allclose(data_read[:5], [-1, 1, -1, 1, -1], atol=1e-4)
+            np.testing.assert_allclose(data_read[5:], 0, atol=1e-4)
+
+    def test_InvalidSignalHeader(self):
+        f = pyedflib.EdfWriter(self.edf_data_file, 1,
+                               file_type=pyedflib.FILETYPE_EDFPLUS)
+        data = np.linspace(-1, 1, 200)
+        # BDF range, rejected by edflib for EDF files
+        f.setDigitalMaximum(0, 8388607)
+        self.assertRaises(ValueError, f.writeSamples, [data])
+        f.setDigitalMaximum(0, 32767)
+        f.setPhysicalMaximum(0, -1)
+        self.assertRaises(ValueError, f.writeSamples, [data])
+        f.setPhysicalMaximum(0, 1)
+        f.writeSamples([data])
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.edf_data_file)
+        data_read = f.readSignal(0)
+        f._close()
+        del f
+        np.testing.assert_allclose(data_read, data, atol=1e-4)
+
+    def test_DigitalSampleWriting(self):
+        channel_info = {'label': 'test_label', 'dimension': 'mV', 'sample_rate': 100,
+                        'physical_max': 32767.0, 'physical_min': -32768.0,
+                        'digital_max': 32767, 'digital_min': -32768,
+                        'prefilter': 'pre1', 'transducer': 'trans1'}
+        f = pyedflib.EdfWriter(self.edf_data_file, 2,
+                               file_type=pyedflib.FILETYPE_EDFPLUS)
+        f.setSignalHeaders([channel_info, channel_info])
+        data1 = np.arange(-100, 100, dtype=np.int32) * 100
+        data2 = np.arange(100, -100, -1, dtype=np.int32) * 100
+        f.writeDigitalSamples(data1[:100])
+        f.writeDigitalSamples(data2[:100])
+        f.blockWriteDigitalSamples(np.concatenate([data1[100:], data2[100:]]))
+        f.close()
+        del f
+
+        f = pyedflib.EdfReader(self.edf_data_file)
+        data1_read = f.readSignal(0)
+        data2_read = f.readSignal(1)
+        f._close()
+        del f
+        np.testing.assert_almost_equal(data1_read, data1)
+        np.testing.assert_almost_equal(data2_read, data2)
+
     def test_AnnotationWriting(self):
         channel_info = {'label': 'test_label', 'dimension': 'mV', 'sample_rate': 100,
                         'physical_max': 1.0, 'physical_min': -1.0,